@@ -1,42 +1,118 @@
+from functools import lru_cache
 from numbers import Integral
 from typing import List
+import numpy as np
 
 from msdsl.expr.format import RealFormat, UIntFormat
-from msdsl.expr.expr import wrap_constants, promote_operands, EqualTo, Sum, Product, prod_op, sum_op, ModelExpr
+from msdsl.expr.expr import wrap_constants, promote_operands, EqualTo, Sum, Product, prod_op, sum_op, ModelExpr, Constant
 from msdsl.expr.signals import DigitalSignal, Signal
 from msdsl.expr.svreal import UndefinedRange
 
-def subst_case(expr, sel_bit_settings):
-    if isinstance(expr, EqnCase):
-        # select the appropriate case
-        case = expr.get_case(sel_bit_settings)
+def subst_case(expr, sel_bit_settings, cache=None):
+    # the cache may be shared across calls (e.g., when iterating over all sel_bit settings of a system of
+    # equations), so that subexpressions that do not depend on the sel_bits are only walked once.
+    cache = cache if cache is not None else {}
+
+    # make the settings hashable once, rather than at every level of the recursion
+    settings_key = tuple(sorted(sel_bit_settings.items()))
 
-        # apply case substitution again (allows for nested cases)
-        case = subst_case(case, sel_bit_settings)
+    return _subst_case(expr, sel_bit_settings, settings_key, cache)
 
-        # return result
-        return case
+def _subst_case(expr, sel_bit_settings, settings_key, cache):
+    # check whether this expression has already been processed.  results that do not depend on the sel_bit
+    # settings are stored with a key of None.  note that the original expression is saved along with the
+    # result so that its id() cannot be reused by another object while the cache is alive.
+    for key in [(id(expr), None), (id(expr), settings_key)]:
+        if key in cache:
+            return cache[key][1]
+
+    if isinstance(expr, EqnCase):
+        # select the appropriate case, then apply case substitution again (allows for nested cases)
+        retval = _subst_case(expr.get_case(sel_bit_settings), sel_bit_settings, settings_key, cache)
     elif isinstance(expr, EqualTo):
-        return EqualTo(subst_case(expr.lhs, sel_bit_settings), subst_case(expr.rhs, sel_bit_settings))
-    elif isinstance(expr, Sum):
-        return sum_op(subst_case(operand, sel_bit_settings) for operand in expr.operands)
-    elif isinstance(expr, Product):
-        return prod_op(subst_case(operand, sel_bit_settings) for operand in expr.operands)
+        lhs = _subst_case(expr.lhs, sel_bit_settings, settings_key, cache)
+        rhs = _subst_case(expr.rhs, sel_bit_settings, settings_key, cache)
+        if lhs is expr.lhs and rhs is expr.rhs:
+            retval = expr
+        else:
+            retval = EqualTo(lhs, rhs)
+    elif isinstance(expr, (Sum, Product)):
+        operands = [_subst_case(operand, sel_bit_settings, settings_key, cache) for operand in expr.operands]
+        if all(new is old for new, old in zip(operands, expr.operands)):
+            retval = expr
+        elif isinstance(expr, Sum):
+            retval = sum_op(operands)
+        else:
+            retval = prod_op(operands)
     else:
         return expr
 
+    # an expression that comes back unchanged contains no EqnCase, so the result is valid for any sel_bit settings.
+    # rebuilt expressions that are equal to one built earlier (e.g., for another sel_bit setting that selects the
+    # same cases) are replaced by the earlier one, so that the cache also hits on them further up the tree.
+    if retval is expr:
+        cache[(id(expr), None)] = (expr, retval)
+    else:
+        retval = _intern(retval, cache)
+        cache[(id(expr), settings_key)] = (expr, retval)
+
+    # return result
+    return retval
+
+def _intern(expr, cache):
+    # the table of rebuilt expressions is kept in the same cache as the substitution results, so it lives only as
+    # long as that cache.  expressions are keyed by their class, format, and children; children are matched by
+    # identity, except for constants, which are matched by value since sum_op and prod_op create a new Constant
+    # whenever constants are merged.  the children are kept alive by the cached expression, so their id() values
+    # cannot be reused while the entry exists.
+    if not isinstance(expr, (EqualTo, Sum, Product)):
+        return expr
+
+    try:
+        key = ('intern', type(expr), expr.format_.key(), tuple(_intern_key(operand) for operand in expr.operands))
+    except (NotImplementedError, TypeError):
+        # expressions whose formats can't be represented by a hashable key are not interned
+        return expr
+
+    return cache.setdefault(key, expr)
+
+def _intern_key(operand):
+    if isinstance(operand, Constant):
+        return (Constant, type(operand.value), operand.value, operand.format_.key())
+    else:
+        return id(operand)
+
 def address_to_settings(address, sel_bits):
     # sanity checks
     assert isinstance(address, Integral), 'Address must be an integer.'
     assert 0 <= address <= (1 << len(sel_bits)) - 1, f'The address {address} cannot be represented using {len(sel_bits)} sel_bits.'
 
-    # build up the dictionary of settings
-    sel_bit_settings = {}
-    for idx, sel_bit in enumerate(sel_bits[::-1]):
-        sel_bit_settings[sel_bit.name] = (address >> idx) & 1
-
-    # return the settings
-    return sel_bit_settings
+    # extract the bit of the address for each sel_bit (the first sel_bit is the MSB)
+    n = len(sel_bits)
+    return {sel_bit.name: (address >> (n-1-k)) & 1 for k, sel_bit in enumerate(sel_bits)}
+
+# largest number of sel_bits for which the bit table is built
+MAX_BIT_TABLE_WIDTH = 16
+
+@lru_cache(maxsize=8)
+def bit_table(n):
+    # returns a tuple whose k-th entry is a tuple of the n bits of the address k, MSB first.  the bits of all
+    # addresses are extracted at once by viewing the addresses as big-endian bytes and unpacking them.  the most
+    # recent tables are cached, since the same table is needed for every system of equations with the same number
+    # of sel_bits.
+    assert n <= 64, 'At most 64 sel_bits are supported.'
+    addrs = np.arange(1 << n, dtype='>u8').view(np.uint8).reshape(-1, 8)
+    bits = np.unpackbits(addrs, axis=1)[:, 64-n:]
+    return tuple(tuple(row) for row in bits.tolist())
+
+def settings_table(sel_bits):
+    # returns a list of sel_bit settings for every address, i.e., entry k is equal to address_to_settings(k, sel_bits).
+    # the first sel_bit is the MSB of the address.
+    if len(sel_bits) > MAX_BIT_TABLE_WIDTH:
+        return [address_to_settings(address, sel_bits) for address in range(1 << len(sel_bits))]
+
+    names = [sel_bit.name for sel_bit in sel_bits]
+    return [dict(zip(names, row)) for row in bit_table(len(names))]
 
 def eqn_case(cases, sel_bits: List[DigitalSignal]):
     """
@@ -59,10 +135,21 @@ def eqn_case(cases, sel_bits: List[DigitalSignal]):
     # return the result
     if len(cases) == 0:
         raise ValueError('EqnCase must have at least one case.')
-    elif len(cases) == 1:
+    elif all(same_case(case, cases[0]) for case in cases[1:]):
+        # the value doesn't depend on the sel_bits, so no EqnCase is needed
         return cases[0]
     else:
-        return EqnCase(cases=cases, sel_bits=sel_bits)
+        return EqnCase(cases, sel_bits)
+
+def same_case(a, b):
+    # returns True if the two cases are known to be the same: either the same expression or constants with the
+    # same value.
+    if a is b:
+        return True
+    elif isinstance(a, Constant) and isinstance(b, Constant):
+        return type(a.value) is type(b.value) and a.value == b.value
+    else:
+        return False
 
 class EqnCase(ModelExpr):
     def __init__(self, cases, sel_bits):
@@ -70,6 +157,10 @@ class EqnCase(ModelExpr):
         self.cases = cases
         self.sel_bits = sel_bits
 
+        # precompute the names of the sel_bits and the address bit corresponding to each one (MSB first)
+        self._sel_names = tuple(sel_bit.name for sel_bit in sel_bits)
+        self._masks = tuple(1 << (len(sel_bits)-1-k) for k in range(len(sel_bits)))
+
         # call the super constructor
         super().__init__(format_=RealFormat(range_=UndefinedRange()))
 
@@ -77,11 +168,7 @@ class EqnCase(ModelExpr):
         # returns the case table address corresponding to the given sel_bit_settings.  note that some sel_bits
         # in sel_bit_settings may not be present in this EqnCase.  that's OK; they are effectively treated
         # as don't care bits and do not consume extra resources.
-        addr = 0
-        for sel_bit in self.sel_bits:
-            addr <<= 1
-            addr |= 1 if sel_bit_settings[sel_bit.name] else 0
-        return addr
+        return sum(mask for name, mask in zip(self._sel_names, self._masks) if sel_bit_settings[name])
 
     def get_case(self, sel_bit_settings):
         # returns the expression corresponsing
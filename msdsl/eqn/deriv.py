@@ -8,6 +8,8 @@ class Deriv(AnalogSignal):
     """
     Container for a derivative used within MSDSL.
     """
+    __slots__ = ('signal',)
+
     def __init__(self, signal: Signal):
         self.signal = signal
         super().__init__(name=deriv_str(signal.name), range_=UndefinedRange())
@@ -23,7 +23,7 @@ class EqnList:
         self.add_eqns([eqn])
 
     def add_eqns(self, eqns: List[ModelExpr]):
-        self.eqns = self.eqns + eqns
+        self.eqns.extend(eqns)
 
     # signal access functions
 
@@ -34,7 +34,7 @@ class EqnList:
         return [deriv for eqn in self.eqns for deriv in walk_expr(eqn, lambda e: isinstance(e, Deriv))]
 
     def get_states(self):
-        return [deriv.signal for eqn in self.eqns for deriv in walk_expr(eqn, lambda e: isinstance(e, Deriv))]
+        return [deriv.signal for deriv in self.get_derivs()]
 
     def get_eqn_cases(self):
         return [eqn_case for eqn in self.eqns for eqn_case in walk_expr(eqn, lambda e: isinstance(e, EqnCase))]
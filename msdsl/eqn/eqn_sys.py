@@ -11,8 +11,9 @@ from msdsl.eqn.eqn_list import EqnList
 from msdsl.eqn.cases import subst_case
 
 class EqnSys(EqnList):
-    def subst_case(self, sel_bit_settings):
-        return EqnSys([subst_case(expr=eqn, sel_bit_settings=sel_bit_settings) for eqn in self])
+    def subst_case(self, sel_bit_settings, cache=None):
+        cache = cache if cache is not None else {}
+        return EqnSys([subst_case(expr=eqn, sel_bit_settings=sel_bit_settings, cache=cache) for eqn in self])
 
     def to_lds(self, inputs: List[Signal]=None, states: List[Signal]=None, outputs: List[Signal]=None):
         # set defaults
@@ -24,30 +25,36 @@ class EqnSys(EqnList):
         deriv_dict = {deriv.name: deriv for deriv in self.get_derivs()}
         derivs = list(deriv_dict.values())
 
+        # names of each group of signals, computed once since they are used throughout this method
+        input_names,  input_set  = signal_names(inputs),  {signal.name for signal in inputs}
+        output_names, output_set = signal_names(outputs), {signal.name for signal in outputs}
+        state_names,  state_set  = signal_names(states),  {signal.name for signal in states}
+        deriv_names,  deriv_set  = signal_names(derivs),  {signal.name for signal in derivs}
+
         # sanity check: no repeated entries in inputs, states, derivatives, or outputs
-        assert len(set(signal_names(inputs))) == len(inputs), 'Repeated entries in inputs.'
-        assert len(set(signal_names(outputs))) == len(outputs), 'Repeated entries in outputs.'
-        assert len(set(signal_names(states))) == len(states), 'Repeated entries in states.'
-        assert len(set(signal_names(derivs))) == len(derivs), 'Repeated entries in derivatives.'
+        assert len(input_set) == len(inputs), 'Repeated entries in inputs.'
+        assert len(output_set) == len(outputs), 'Repeated entries in outputs.'
+        assert len(state_set) == len(states), 'Repeated entries in states.'
+        assert len(deriv_set) == len(derivs), 'Repeated entries in derivatives.'
 
         # sanity check: inputs, states, derivatives, and outputs should be disjoint
-        assert set(signal_names(inputs)).isdisjoint(signal_names(outputs)), 'Inputs and outputs are not disjoint.'
-        assert set(signal_names(inputs)).isdisjoint(signal_names(states)), 'Inputs and states are not disjoint.'
-        assert set(signal_names(inputs)).isdisjoint(signal_names(derivs)), 'Inputs and state derivatives are not disjoint.'
-        assert set(signal_names(outputs)).isdisjoint(signal_names(states)), 'Outputs and states are not disjoint.'
-        assert set(signal_names(outputs)).isdisjoint(signal_names(derivs)), 'Outputs and state derivatives are not disjoint.'
-        assert set(signal_names(states)).isdisjoint(signal_names(derivs)), 'States and state derivatives are not disjoint.'
+        assert input_set.isdisjoint(output_set), 'Inputs and outputs are not disjoint.'
+        assert input_set.isdisjoint(state_set), 'Inputs and states are not disjoint.'
+        assert input_set.isdisjoint(deriv_set), 'Inputs and state derivatives are not disjoint.'
+        assert output_set.isdisjoint(state_set), 'Outputs and states are not disjoint.'
+        assert output_set.isdisjoint(deriv_set), 'Outputs and state derivatives are not disjoint.'
+        assert state_set.isdisjoint(deriv_set), 'States and state derivatives are not disjoint.'
 
         # sanity check: signal names of derivatives should be the states
-        assert set(signal_names(states)) == set(signal_names([deriv.signal for deriv in derivs]))
+        assert state_set == {deriv.signal.name for deriv in derivs}
 
         # create list of all internal signals, then use it to figure out what signals are completely internal
-        external_names = set(signal_names(inputs + outputs + states + derivs))
+        external_names = input_set | output_set | state_set | deriv_set
         internal_name_set = set(signal_names(self.get_all_signals())) - external_names
 
         # indices of known and unknown variables
-        unknowns = list2dict(list(internal_name_set) + signal_names(outputs) + signal_names(derivs))
-        knowns   = list2dict(signal_names(inputs) + signal_names(states))
+        unknowns = list2dict(list(internal_name_set) + output_names + deriv_names)
+        knowns   = list2dict(input_names + state_names)
 
         # sanity checks
         assert not(len(self) > len(unknowns)), f'System of equations is over-constrained with {len(self)} equations and {len(unknowns)} unknowns.'
@@ -79,38 +86,17 @@ class EqnSys(EqnList):
         # solve for unknowns in terms of knowns
         M = np.linalg.solve(U, V)
 
-        # separate into A, B, C, D matrices
-        if len(states) > 0:
-            A = np.zeros((len(states), len(states)), dtype=float)
-            for row, out_state in enumerate(signal_names(states)):
-                for col, in_state in enumerate(signal_names(states)):
-                    A[row, col] = M[unknowns[deriv_str(out_state)], knowns[in_state]]
-        else:
-            A = None
-
-        if len(states) > 0 and len(inputs) > 0:
-            B = np.zeros((len(states), len(inputs)), dtype=float)
-            for row, out_state in enumerate(signal_names(states)):
-                for col, in_input in enumerate(signal_names(inputs)):
-                    B[row, col] = M[unknowns[deriv_str(out_state)], knowns[in_input]]
-        else:
-            B = None
-
-        if len(outputs) > 0 and len(states) > 0:
-            C = np.zeros((len(outputs), len(states)), dtype=float)
-            for row, out_output in enumerate(signal_names(outputs)):
-                for col, in_state in enumerate(signal_names(states)):
-                    C[row, col] = M[unknowns[out_output], knowns[in_state]]
-        else:
-            C = None
-
-        if len(outputs) > 0 and len(inputs) > 0:
-            D = np.zeros((len(outputs), len(inputs)), dtype=float)
-            for row, out_output in enumerate(signal_names(outputs)):
-                for col, in_input in enumerate(signal_names(inputs)):
-                    D[row, col] = M[unknowns[out_output], knowns[in_input]]
-        else:
-            D = None
+        # determine the rows and columns of M corresponding to each part of the LDS
+        deriv_rows  = [unknowns[deriv_str(name)] for name in state_names]
+        output_rows = [unknowns[name] for name in output_names]
+        state_cols  = [knowns[name] for name in state_names]
+        input_cols  = [knowns[name] for name in input_names]
+
+        # separate into A, B, C, D matrices (each is extracted from M in a single indexing operation)
+        A = M[np.ix_(deriv_rows, state_cols)] if len(states) > 0 else None
+        B = M[np.ix_(deriv_rows, input_cols)] if len(states) > 0 and len(inputs) > 0 else None
+        C = M[np.ix_(output_rows, state_cols)] if len(outputs) > 0 and len(states) > 0 else None
+        D = M[np.ix_(output_rows, input_cols)] if len(outputs) > 0 and len(inputs) > 0 else None
 
         return LDS(A=A, B=B, C=C, D=D)
 
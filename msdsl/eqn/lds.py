@@ -1,4 +1,5 @@
 from numbers import Number
+from typing import List
 
 import numpy as np
 import scipy.linalg
@@ -12,33 +13,7 @@ class LDS:
         self.D = D
 
     def discretize(self, dt: Number):
-        # discretize A
-        if self.A is not None:
-            A_tilde = scipy.linalg.expm(dt * self.A)
-        else:
-            A_tilde = None
-
-        # discretize B
-        if self.A is not None and self.B is not None:
-            I = np.eye(*self.A.shape) # identity matrix with shape of A
-            B_tilde = np.linalg.solve(self.A, (A_tilde - I).dot(self.B))
-        else:
-            B_tilde = None
-
-        # discretize C
-        if self.C is not None:
-            C_tilde = self.C.copy()
-        else:
-            C_tilde = None
-
-        # discretize D
-        if self.D is not None:
-            D_tilde = self.D.copy()
-        else:
-            D_tilde = None
-
-        # return result
-        return LDS(A=A_tilde, B=B_tilde, C=C_tilde, D=D_tilde)
+        return discretize_lds_list([self], dt=dt)[0]
 
     # overloaded methods
 
@@ -56,22 +31,180 @@ class LDS:
         # return result
         return retval
 
+def expm_stack(M):
+    # returns the matrix exponential of each matrix in the stack M, which has shape (K, n, n).  recent versions
+    # of scipy accept a stack of matrices directly, while older versions only handle one matrix at a time.
+    try:
+        return scipy.linalg.expm(M)
+    except ValueError:
+        return np.array([scipy.linalg.expm(elem) for elem in M])
+
+def stack_matrices(mats):
+    # stacks a list of matrices along a new first axis, or returns None if the matrices are not defined
+    return np.stack(mats) if len(mats) > 0 and mats[0] is not None else None
+
+def discretize_stack(A, B, dt: Number):
+    # discretizes a stack of systems, where A has shape (K, n, n) and B has shape (K, n, m) or is None.  returns
+    # a tuple of the discretized A and B stacks.
+
+    # systems with a diagonal A matrix decouple into independent first-order systems, which are discretized
+    # elementwise.  the rest are handled by the general method.
+    a = np.diagonal(A, axis1=1, axis2=2)
+    diag = np.all(A == a[:, :, np.newaxis]*np.eye(A.shape[1]), axis=(1, 2))
+    return split_stack(diag, discretize_stack_diag, discretize_stack_general, A, B, dt)
+
+def split_stack(mask, method_true, method_false, A, B, dt: Number):
+    # discretizes the systems selected by mask using method_true, and the others using method_false
+    if np.all(mask):
+        return method_true(A, B, dt)
+    elif not np.any(mask):
+        return method_false(A, B, dt)
+
+    A_tilde = np.empty(A.shape)
+    B_tilde = np.empty(B.shape) if B is not None else None
+    for idx, method in [(np.flatnonzero(mask), method_true), (np.flatnonzero(~mask), method_false)]:
+        A_tilde[idx], B_part = method(A[idx], B[idx] if B is not None else None, dt)
+        if B is not None:
+            B_tilde[idx] = B_part
+
+    return A_tilde, B_tilde
+
+def discretize_stack_diag(A, B, dt: Number):
+    # same as discretize_stack, but only for systems with a diagonal A matrix.  in that case A_tilde is just
+    # diag(exp(a*dt)), and row i of B_tilde is (exp(a_i*dt)-1)/a_i times row i of B.  the factor is computed
+    # with expm1 for accuracy, and its limit dt is used in rows where a_i is zero (i.e., pure integrators).
+    a = np.diagonal(A, axis1=1, axis2=2)
+    A_tilde = np.exp(dt*a)[:, :, np.newaxis]*np.eye(A.shape[1])
+    if B is None:
+        return A_tilde, None
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(a == 0, dt, np.expm1(dt*a)/a)
+    return A_tilde, scale[:, :, np.newaxis]*B
+
+def discretize_stack_general(A, B, dt: Number):
+    # same as discretize_stack, but for any A matrix.  this is used for every system whose A matrix isn't
+    # diagonal, regardless of size.
+    if B is None:
+        return expm_stack(dt * A), None
+
+    # the exponential of the block matrix [[A, B], [0, 0]]*dt is [[A_tilde, B_tilde], [0, I]] (Van Loan's method),
+    # so a single matrix exponential gives both results.  unlike solving A*B_tilde = (A_tilde - I)*B, this also
+    # works when A is singular, and keeps full precision as dt*|A| goes to zero.
+    K, n, m = B.shape
+    M = np.zeros((K, n+m, n+m), dtype=float)
+    M[:, :n, :n] = A
+    M[:, :n, n:] = B
+    E = expm_stack(dt * M)
+
+    return E[:, :n, :n], E[:, :n, n:]
+
+# previously discretized systems, indexed by the timestep and the contents of A and B.  models often contain several
+# systems with the same matrices (e.g., repeated subcircuits, or sel_bit settings that lead to the same system), and
+# these only have to be discretized once.  the cache is simply cleared if it grows too large.
+_discretized = {}
+_max_discretized = 10000
+
+def discretize_key(A, B, dt: Number):
+    # returns a hashable key identifying the discretization of (A, B) with timestep dt
+    return (float(dt), A.dtype.str, A.shape, A.tobytes(),
+            (B.dtype.str, B.shape, B.tobytes()) if B is not None else None)
+
+def discretize_lds_list(lds_list: List[LDS], dt: Number):
+    """
+    Discretizes a list of linear dynamical systems with the same dimensions, assuming piecewise-constant input
+    (zero-order hold).  Systems that have already been discretized with the same timestep are looked up from a
+    cache, and the matrices of the remaining systems are stacked so that the matrix exponentials are
+    done in a single batched call.
+
+    :param lds_list:    List of continuous-time LDS objects
+    :param dt:          Timestep
+    :return:            List of discrete-time LDS objects
+    """
+
+    # stack up the matrices
+    A = stack_matrices([lds.A for lds in lds_list])
+    B = stack_matrices([lds.B for lds in lds_list])
+    C = stack_matrices([lds.C for lds in lds_list])
+    D = stack_matrices([lds.D for lds in lds_list])
+
+    # discretize A and B
+    if A is not None:
+        # look up systems that have already been discretized, making a note of the first occurrence of each new one
+        keys = [discretize_key(lds.A, lds.B, dt) for lds in lds_list]
+        results = {}
+        misses = {}
+        for k, key in enumerate(keys):
+            if key in results or key in misses:
+                continue
+            elif key in _discretized:
+                results[key] = _discretized[key]
+            else:
+                misses[key] = k
+
+        # discretize the new systems in a single batch
+        if len(misses) > 0:
+            idx = list(misses.values())
+            A_new, B_new = discretize_stack(A[idx], B[idx] if B is not None else None, dt)
+            if len(_discretized) + len(misses) > _max_discretized:
+                _discretized.clear()
+            for j, key in enumerate(misses):
+                results[key] = _discretized[key] = (A_new[j], B_new[j] if B_new is not None else None)
+
+        # gather the results (stacking makes copies, so the cached matrices can't be modified)
+        A_tilde = np.stack([results[key][0] for key in keys])
+        B_tilde = np.stack([results[key][1] for key in keys]) if B is not None else None
+    else:
+        A_tilde = None
+        B_tilde = None
+
+    # C and D are unchanged (C_tilde and D_tilde are already copies because of the stacking)
+    C_tilde = C
+    D_tilde = D
+
+    # unpack results
+    return [LDS(A=A_tilde[k] if A_tilde is not None else None,
+                B=B_tilde[k] if B_tilde is not None else None,
+                C=C_tilde[k] if C_tilde is not None else None,
+                D=D_tilde[k] if D_tilde is not None else None)
+            for k in range(len(lds_list))]
+
 class LdsCollection:
     def __init__(self):
-        self.A = None
-        self.B = None
-        self.C = None
-        self.D = None
+        self.lds_list = []
+        self._stacked = {}
 
     def append(self, lds: LDS):
-        # Add extra dimension to each array
-        A = lds.A[:, :, np.newaxis] if lds.A is not None else None
-        B = lds.B[:, :, np.newaxis] if lds.B is not None else None
-        C = lds.C[:, :, np.newaxis] if lds.C is not None else None
-        D = lds.D[:, :, np.newaxis] if lds.D is not None else None
-
-        # Update each array
-        self.A = np.concatenate((self.A, A), axis=2) if self.A is not None else A
-        self.B = np.concatenate((self.B, B), axis=2) if self.B is not None else B
-        self.C = np.concatenate((self.C, C), axis=2) if self.C is not None else C
-        self.D = np.concatenate((self.D, D), axis=2) if self.D is not None else D
+        self.lds_list.append(lds)
+        self._stacked = {}
+
+    def discretize(self, dt: Number):
+        retval = LdsCollection()
+        for lds in discretize_lds_list(self.lds_list, dt=dt):
+            retval.append(lds)
+        return retval
+
+    def get_stacked(self, name):
+        # returns the given matrix of all systems in the collection, stacked along a new last axis so that
+        # X[row, col] is the vector of values taken by that entry over the collection.  the result is built
+        # once (rather than by growing an array on each append) and cached until the next append.
+        if name not in self._stacked:
+            mats = [getattr(lds, name) for lds in self.lds_list]
+            self._stacked[name] = np.stack(mats, axis=2) if len(mats) > 0 and mats[0] is not None else None
+        return self._stacked[name]
+
+    @property
+    def A(self):
+        return self.get_stacked('A')
+
+    @property
+    def B(self):
+        return self.get_stacked('B')
+
+    @property
+    def C(self):
+        return self.get_stacked('C')
+
+    @property
+    def D(self):
+        return self.get_stacked('D')
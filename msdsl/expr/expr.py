@@ -1,4 +1,3 @@
-from functools import reduce
 from typing import List, Tuple
 from numbers import Number, Integral, Real
 from math import floor, ceil
@@ -48,6 +47,12 @@ def promote_operands(operands, promoted_cls):
     return [promote_operand(operand=operand, promoted_cls=promoted_cls) for operand in operands]
 
 class ModelExpr:
+    # signals are created in large numbers, so the Signal classes declare __slots__ to avoid a per-instance
+    # __dict__.  this only works if every base class does the same, hence the declaration here.  other
+    # expression classes don't declare __slots__ and get a __dict__ as usual.  __weakref__ is included so that
+    # signals can still be weakly referenced, as they could before __slots__ was declared.
+    __slots__ = ('format_', '__weakref__')
+
     def __init__(self, format_):
         self.format_ = format_
 
@@ -183,11 +188,20 @@ class ArithmeticOperator(ModelOperator):
 
     def __init__(self, operands):
         # determine the output format
-        format_ = reduce(self.function, [operand.format_ for operand in operands])
+        format_ = self.combine_formats([operand.format_ for operand in operands])
 
         # call the super constructor
         super().__init__(operands=operands, format_=format_)
 
+    @classmethod
+    def combine_formats(cls, formats):
+        # folds the formats together using the operator's function
+        iterator = iter(formats)
+        retval = next(iterator)
+        for format_ in iterator:
+            retval = cls.function(retval, format_)
+        return retval
+
     @classmethod
     def function(cls, a, b):
         raise NotImplementedError
@@ -24,6 +24,11 @@ class Format:
     def cover(cls, formats):
         raise NotImplementedError
 
+    def key(self):
+        # returns a hashable value that is equal for any two formats that behave identically.  the type of
+        # each field is included so that (for example) a range of 1 is not confused with a range of 1.0
+        raise NotImplementedError
+
 class RealFormat(Format):
     # format shortname to aid with human-readable output
     shortname = 'real'
@@ -87,6 +92,9 @@ class RealFormat(Format):
         range_ = range_max([format_.range_ for format_ in formats])
         return cls(range_=range_)
 
+    def key(self):
+        return (type(self),) + tuple((type(field), field) for field in (self.range_, self.width, self.exponent))
+
     def __str__(self):
         return (f'{self.__class__.__name__}(range={self.range_})')
 
@@ -181,6 +189,9 @@ class IntFormat(Format):
         # return new format
         return cls(width=width, min_val=min_val, max_val=max_val)
 
+    def key(self):
+        return (type(self),) + tuple((type(field), field) for field in (self.width, self.min_val, self.max_val))
+
     def __str__(self):
         return (f'{self.__class__.__name__}(width={self.width}, min_val={self.min_val}, max_val={self.max_val})')
 
@@ -5,6 +5,8 @@ from msdsl.expr.format import RealFormat, UIntFormat, SIntFormat, is_signed
 from msdsl.expr.svreal import RangeOf, WidthOf, ExponentOf, UndefinedRange, ParamRange
 
 class Signal(ModelExpr):
+    __slots__ = ('name',)
+
     def __init__(self, name, format_):
         self.name = name
         super().__init__(format_=format_)
@@ -22,6 +24,8 @@ class AnalogSignal(Signal):
     :param width:       Specify a width different from the default.
     :param exponent:    Specify an exponent different from the default. Usually this is automatically calculated.
     """
+    __slots__ = ()
+
     def __init__(self, name, range_=None, width=None, exponent=None):
         range_ = range_ if range_ is not None else UndefinedRange()
         format_ = RealFormat(range_=range_, width=width, exponent=exponent)
@@ -38,6 +42,8 @@ class AnalogState(AnalogSignal):
     :param exponent:    Specify an exponent different from the default. Usually this is automatically calculated.
     :param init:        Initial value of the analog state.
     """
+    __slots__ = ('init',)
+
     def __init__(self, name, range_, width=None, exponent=None, init=0):
         self.init = init
         super().__init__(name=name, range_=range_, width=width, exponent=exponent)
@@ -50,6 +56,8 @@ class AnalogOutput(AnalogSignal):
     :param name:        Name of the analog signal to be added
     :param init:        Initial value of the analog output.
     """
+    __slots__ = ('init',)
+
     def __init__(self, name, init=0):
         self.init = init
         super().__init__(name=name, range_=RangeOf(name), width=WidthOf(name), exponent=ExponentOf(name))
@@ -61,10 +69,14 @@ class AnalogInput(AnalogSignal):
 
     :param name:        Name of the analog signal to be added
     """
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name=name, range_=RangeOf(name), width=WidthOf(name), exponent=ExponentOf(name))
 
 class RealParameter(AnalogSignal):
+    __slots__ = ('param_name', 'default')
+
     def __init__(self, param_name, signal_name, default=0):
         self.param_name = param_name
         self.default = default
@@ -87,6 +99,8 @@ class DigitalSignal(Signal):
     :param max_val:     Maximum value of the signal.  You should generally leave this as "None" so that it will be
                         filled in automatically.
     """
+    __slots__ = ()
+
     def __init__(self, name, width=1, signed=False, min_val=None, max_val=None):
         # determine the foramt
         if signed:
@@ -116,6 +130,8 @@ class DigitalParameter(DigitalSignal):
     :param max_val:     Maximum value of the signal.  You should generally leave this as "None" so that it will be
                         filled in automatically.
     """
+    __slots__ = ('default',)
+
     def __init__(self, name, width=1, signed=False, default=0, min_val=None, max_val=None):
         # call the super constructor
         super().__init__(name=name, width=width, signed=signed, min_val=min_val, max_val=max_val)
@@ -146,6 +162,8 @@ class DigitalState(DigitalSignal):
     :param max_val:     Maximum value of the signal.  You should generally leave this as "None" so that it will be
                         filled in automatically.
     """
+    __slots__ = ('init',)
+
     def __init__(self, name, width=1, signed=False, init=0, min_val=None, max_val=None):
         self.init = init
         super().__init__(name=name, width=width, signed=signed, min_val=min_val, max_val=max_val)
@@ -164,6 +182,8 @@ class DigitalOutput(DigitalSignal):
     :param max_val:     Maximum value of the signal.  You should generally leave this as "None" so that it will be
                         filled in automatically.
     """
+    __slots__ = ('init',)
+
     def __init__(self, name, width=1, signed=False, init=0, min_val=None, max_val=None):
         self.init = init
         super().__init__(name=name, width=width, signed=signed, min_val=min_val, max_val=max_val)
@@ -181,7 +201,7 @@ class DigitalInput(DigitalSignal):
     :param max_val:     Maximum value of the signal.  You should generally leave this as "None" so that it will be
                         filled in automatically.
     """
-    pass
+    __slots__ = ()
 
 def main():
     a = DigitalSignal('a', width=8, signed=True)
@@ -2,23 +2,19 @@ from typing import List
 from msdsl.generator.generator import CodeGenerator
 
 def case_statment(gen: CodeGenerator, sel, var, values: List, default=None):
-    gen.writeln('always @(*) begin')
-    gen.indent()
+    # case tables can be large, so the whole block is assembled first and then written at once
+    outer = gen.indentation()
+    inner = gen.indentation(gen.tab_level + 1)
+    body = gen.indentation(gen.tab_level + 2)
 
-    gen.writeln(f'case ({sel})')
-    gen.indent()
-
-    for k, value in enumerate(values):
-        gen.writeln(f'{k}: {var} = {value};')
+    lines = [f'{outer}always @(*) begin', f'{inner}case ({sel})']
+    lines += [f'{body}{k}: {var} = {value};' for k, value in enumerate(values)]
 
     if default is not None:
-        gen.writeln(f'default: {var} = {default};')
-
-    gen.dedent()
-    gen.writeln('endcase')
+        lines.append(f'{body}default: {var} = {default};')
 
-    gen.dedent()
-    gen.writeln('end')
+    lines += [f'{inner}endcase', f'{outer}end', '']
+    gen.write(gen.line_ending.join(lines))
 
 def main():
     gen = CodeGenerator()
@@ -16,10 +16,42 @@ class CodeGenerator:
 
         # initialize variables
         self.tab_level = 0
-        self.text = ''
+        self._chunks = []
+        self._file = None
+
+    # the generated text is stored as a list of chunks and only joined when needed, since repeatedly
+    # appending to a string is quadratic in the length of the output.  note that once the output is
+    # streamed to a file (see open), the text is no longer kept in memory, so text is empty after
+    # MixedSignalModel.compile_to_file.
+
+    @property
+    def text(self):
+        return ''.join(self._chunks)
+
+    @text.setter
+    def text(self, value):
+        self._chunks = [value]
+
+    # the whitespace for each indentation level is cached, and the cache is reset whenever tab_string changes
+
+    @property
+    def tab_string(self):
+        return self._tab_string
+
+    @tab_string.setter
+    def tab_string(self, value):
+        self._tab_string = value
+        self._indents = ['']
 
     # concrete functions
 
+    def indentation(self, level=None):
+        # returns the whitespace for the given indentation level, which defaults to the current one
+        level = level if level is not None else self.tab_level
+        while len(self._indents) <= level:
+            self._indents.append(len(self._indents) * self._tab_string)
+        return self._indents[level]
+
     def indent(self):
         self.tab_level += 1
 
@@ -27,15 +59,34 @@ class CodeGenerator:
         self.tab_level -= 1
         assert self.tab_level >= 0
 
+    def open(self, filename):
+        # stream all subsequent output directly to the given file, starting with any text generated so far.
+        # after this, the text property no longer includes the output.
+        self._file = open(filename, 'w', buffering=1<<20)
+        self._file.writelines(self._chunks)
+        self._chunks = []
+
+    def close(self):
+        # the file is forgotten even if closing it fails (e.g., when the final flush runs out of disk space).
+        # the underlying file handle is closed in that case as well.
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
     def write(self, string=''):
-        self.text += string
+        if self._file is not None:
+            self._file.write(string)
+        else:
+            self._chunks.append(string)
 
     def writeln(self, line=''):
-        self.write(self.tab_level * self.tab_string + line + self.line_ending)
+        self.write(self.indentation() + line + self.line_ending)
 
     def write_to_file(self, filename):
         with open(filename, 'w') as f:
-            f.write(self.text)
+            f.writelines(self._chunks)
 
     ###############################
     # abstract methods
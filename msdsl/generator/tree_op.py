@@ -1,13 +1,20 @@
 def tree_op(operands, operator):
-    if len(operands) == 1:
-        return operands[0]
-    elif len(operands) > 1:
-        a = tree_op(operands[:len(operands) // 2], operator=operator)
-        b = tree_op(operands[len(operands) // 2:], operator=operator)
-        return operator(a, b)
-    else:
+    if len(operands) == 0:
         raise Exception('Tree operation cannot be applied to an empty list.')
 
+    return tree_op_range(operands, 0, len(operands), operator=operator)
+
+def tree_op_range(operands, lo, hi, operator):
+    # applies the operator to operands[lo:hi] by splitting the range in half at each level.  indices are passed
+    # down rather than slices, so the operand list isn't copied at every level of the tree.
+    if hi - lo == 1:
+        return operands[lo]
+    else:
+        mid = lo + (hi - lo) // 2
+        a = tree_op_range(operands, lo, mid, operator=operator)
+        b = tree_op_range(operands, mid, hi, operator=operator)
+        return operator(a, b)
+
 def main():
     # tree_op tests
     op = lambda a, b: a+b
@@ -64,6 +64,27 @@ INT_ARITH_OP = {
     Max:     lambda a, b: f'(({a} > {b}) ? {a} : {b})'
 }
 
+# methods of VerilogGenerator used to compile each type of expression.  the first matching entry is used, so
+# subclasses must be listed before their base classes.
+EXPR_HANDLERS = [
+    (Constant, 'make_constant'),
+    (ArithmeticOperator, 'make_arithmetic_operator'),
+    (CompressUInt, 'make_compress_uint'),
+    (RandomInteger, 'make_random_integer'),
+    (BitwiseInv, 'make_bitwise_inv'),
+    (BitwiseOperator, 'make_bitwise_operator'),
+    (ComparisonOperator, 'make_comparison_operator'),
+    (Concatenate, 'make_concatenation'),
+    (Array, 'make_array'),
+    (ArithmeticShift, 'make_arithmetic_shift'),
+    (BitwiseAccess, 'make_bitwise_access'),
+    (TypeConversion, 'make_type_conversion')
+]
+
+# handler functions found so far, indexed by generator class and expression type (see expr_to_signal).  the
+# functions are stored unbound, so that the cache doesn't refer to any generator instance.
+EXPR_HANDLER_CACHE = {}
+
 class VerilogGenerator(CodeGenerator):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -76,34 +97,24 @@ class VerilogGenerator(CodeGenerator):
         # before starting, make sure that the expression is wrapped in case it is a number
         expr = wrap_constant(expr)
 
+        # signals are used as-is
         if isinstance(expr, Signal):
             return expr
-        elif isinstance(expr, Constant):
-            return self.make_constant(expr)
-        elif isinstance(expr, ArithmeticOperator):
-            return self.make_arithmetic_operator(expr)
-        elif isinstance(expr, CompressUInt):
-            return self.make_compress_uint(expr)
-        elif isinstance(expr, RandomInteger):
-            return self.make_random_integer(expr)
-        elif isinstance(expr, BitwiseInv):
-            return self.make_bitwise_inv(expr)
-        elif isinstance(expr, BitwiseOperator):
-            return self.make_bitwise_operator(expr)
-        elif isinstance(expr, ComparisonOperator):
-            return self.make_comparison_operator(expr)
-        elif isinstance(expr, Concatenate):
-            return self.make_concatenation(expr)
-        elif isinstance(expr, Array):
-            return self.make_array(expr)
-        elif isinstance(expr, ArithmeticShift):
-            return self.make_arithmetic_shift(expr)
-        elif isinstance(expr, BitwiseAccess):
-            return self.make_bitwise_access(expr)
-        elif isinstance(expr, TypeConversion):
-            return self.make_type_conversion(expr)
-        else:
-            raise Exception(f'Unknown expression type: {expr.__class__.__name__}')
+
+        # otherwise dispatch on the type of the expression.  the handler for each type is looked up from
+        # EXPR_HANDLERS the first time the type is seen and cached after that.
+        key = (type(self), type(expr))
+        handler = EXPR_HANDLER_CACHE.get(key)
+        if handler is None:
+            for cls, name in EXPR_HANDLERS:
+                if isinstance(expr, cls):
+                    handler = getattr(type(self), name)
+                    break
+            else:
+                raise Exception(f'Unknown expression type: {expr.__class__.__name__}')
+            EXPR_HANDLER_CACHE[key] = handler
+
+        return handler(self, expr)
 
     def make_signal(self, signal: Signal):
         if isinstance(signal.format_, RealFormat):
@@ -690,10 +701,9 @@ class VerilogGenerator(CodeGenerator):
         self.writeln(f'// {content}')
 
     def comma_separated_lines(self, lines):
-        self.write('(' + self.line_ending)
-        self.write((',' + self.line_ending).join([self.tab_string + line for line in lines]))
-        self.write(self.line_ending)
-        self.write(')')
+        self.write(''.join(['(', self.line_ending,
+                            (',' + self.line_ending).join([self.tab_string + line for line in lines]),
+                            self.line_ending, ')']))
 
     @staticmethod
     def real_param_str(io):
@@ -1,10 +1,11 @@
-from collections import OrderedDict, Iterable
+from collections import Iterable
 from itertools import chain
 from numbers import Integral, Number
 from readline import insert_text
 from ssl import SSLWantWriteError
 from typing import List, Set, Union
 from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
 import numpy as np
 
@@ -16,7 +17,7 @@ from svreal import RealType
 from msdsl.assignment import (ThisCycleAssignment, NextCycleAssignment, BindingAssignment,
                               SyncRomAssignment, Assignment, SyncRamAssignment)
 from msdsl.expr.analyze import signal_names
-from msdsl.eqn.cases import address_to_settings
+from msdsl.eqn.cases import settings_table
 from msdsl.eqn.eqn_sys import EqnSys
 from msdsl.expr.expr import (ModelExpr, array, concatenate, sum_op, wrap_constant, min_op, clamp_op,
                              to_sint, to_uint, compress_uint, mt19937, lcg_op)
@@ -36,6 +37,49 @@ from msdsl.sweep import Sweep
 
 from scipy.signal import cont2discrete
 
+# signal types that appear in the module definition
+IO_TYPES = (AnalogInput, AnalogOutput, DigitalInput, DigitalOutput)
+
+@lru_cache(maxsize=256)
+def cont2discrete_cached(tf_key, dt):
+    # the arrays in the result are shared by every caller that hits the cache, so they are made read-only
+    tf = tuple(np.array(values).reshape(shape) for shape, values in tf_key)
+    retval = cont2discrete(tf, dt)
+    for elem in retval:
+        if isinstance(elem, np.ndarray):
+            elem.flags.writeable = False
+    return retval
+
+def discretize_tf(tf, dt):
+    # the result of cont2discrete is memoized, since the same transfer function is often used several times in a
+    # model (e.g., once per channel).  the parts of the transfer function are converted to a hashable key for this.
+    tf_key = tuple((np.shape(part), tuple(np.ravel(part).tolist())) for part in tf)
+    return cont2discrete_cached(tf_key, dt)
+
+def lds_coeff(values, get_sel):
+    # returns an expression for a coefficient that takes the given values for each sel setting.  coefficients
+    # that are the same for every sel setting are used directly as constants rather than looked up by sel, in
+    # which case the address is not needed at all.
+    if values.count(values[0]) == len(values):
+        return wrap_constant(values[0])
+    else:
+        return array(values, get_sel())
+
+def lds_terms(X, signals, n_rows, get_sel):
+    # returns, for each row of the stacked coefficient matrix X (with shape (n_rows, len(signals), K)), the list of
+    # coefficient-signal products for that row.  coefficients that are zero for every sel setting are skipped,
+    # since the resulting terms would be discarded by sum_op anyway.  the nonzero entries of the whole matrix are
+    # found in a single numpy call, in row-major order, and their values are converted to python floats in bulk.
+    retval = [[] for _ in range(n_rows)]
+    if n_rows == 0 or len(signals) == 0:
+        return retval
+
+    rows, cols = np.nonzero(np.any(X != 0, axis=2))
+    for row, col, values in zip(rows.tolist(), cols.tolist(), X[rows, cols].tolist()):
+        retval[row].append(lds_coeff(values, get_sel) * signals[col])
+
+    return retval
+
 class Bus:
     def __init__(self, signal: Signal, n: Integral):
         self.signal = signal
@@ -50,8 +94,9 @@ class MixedSignalModel:
         self.real_type = real_type
 
         # initialize
-        self.signals = OrderedDict()
-        self.assignments = OrderedDict()
+        self.signals = {}
+        self.assignments = {}
+        self._io_signals = {AnalogInput: [], AnalogOutput: [], DigitalInput: [], DigitalOutput: []}
         self.probes = []
         self.circuits = []
         self.real_params = []
@@ -71,12 +116,23 @@ class MixedSignalModel:
         return next(self.namers[key])
 
     def __getattr__(self, item):
+        # this is only called when normal attribute lookup fails.  private and special names are never signals,
+        # which keeps lookups such as those done by copy and pickle from going through the signal table.
+        if item.startswith('_'):
+            raise AttributeError(item)
+
+        try:
+            return self.__dict__['signals'][item]
+        except KeyError:
+            raise AttributeError(f'The signal {item} has not been defined.')
+
+    def __getitem__(self, item):
         return self.get_signal(item)
 
     def add_signal(self, x: Union[Signal, Bus]):
         """
         Adds a signal or bus object to the model, meaning that it can be accessed by name later.  For example, if
-        we run m.add_signal(Signal(name="abc")), we can access the signal afterwards using m.abc
+        we run m.add_signal(Signal(name="abc")), we can access the signal afterwards using m.abc (or m['abc'])
 
         :param x: Signal or Bus object to be added
         :return: The signal object
@@ -102,6 +158,11 @@ class MixedSignalModel:
             # add the signal to the model dictionary, which makes it possible to access signals as attributes of a Model
             self.signals[x.name] = x
 
+            # keep track of I/O signals by type, so that they can be listed without scanning all signals
+            for io_type, io_signals in self._io_signals.items():
+                if isinstance(x, io_type):
+                    io_signals.append(x)
+
             # return the signal.  this is a convenience that allows the user to instantiate the signal inside the call
             # to add_signal
             return x
@@ -165,23 +226,24 @@ class MixedSignalModel:
         return name in self.signals
 
     def get_signal(self, name: str):
-        assert self.has_signal(name), 'The signal ' + name + ' has not been defined.'
-        return self.signals[name]
+        signal = self.signals.get(name)
+        assert signal is not None, f'The signal {name} has not been defined.'
+        return signal
 
     def get_signals(self, names: Union[List[str], Set[str]]):
         return [self.get_signal(name) for name in names]
 
     def get_analog_inputs(self):
-        return [signal for signal in self.signals.values() if isinstance(signal, AnalogInput)]
+        return self._io_signals[AnalogInput][:]
 
     def get_analog_outputs(self):
-        return [signal for signal in self.signals.values() if isinstance(signal, AnalogOutput)]
+        return self._io_signals[AnalogOutput][:]
 
     def get_digital_inputs(self):
-        return [signal for signal in self.signals.values() if isinstance(signal, DigitalInput)]
+        return self._io_signals[DigitalInput][:]
 
     def get_digital_outputs(self):
-        return [signal for signal in self.signals.values() if isinstance(signal, DigitalOutput)]
+        return self._io_signals[DigitalOutput][:]
 
     # functions to assign signals
 
@@ -557,14 +619,14 @@ class MixedSignalModel:
             if k == 0:
                 self.set_this_cycle(prods_imm[k], addr_frac)
             else:
-                self.set_this_cycle(prods_imm[k], addr_frac*self.get_signal(prods_imm[k-1]))
+                self.set_this_cycle(prods_imm[k], addr_frac*self.signals[prods_imm[k-1]])
 
         # delay products by one cycle (for "sync" mode only)
         if func_mode in {'sync'}:
             prods_del = []
             for k in range(func.order):
                 # get value of immediate product
-                prod_imm = self.get_signal(prods_imm[k])
+                prod_imm = self.signals[prods_imm[k]]
                 # create a delayed signal with the same format
                 prod_del = self.add_analog_state(
                     self.get_next_name(f'{func.name}_prod_del_{k}_'),
@@ -577,7 +639,7 @@ class MixedSignalModel:
                 # save the signal
                 prods_del.append(prod_del)
         elif func_mode in {'async'}:
-            prods_del = [self.get_signal(elem) for elem in prods_imm]
+            prods_del = [self.signals[elem] for elem in prods_imm]
         else:
             raise Exception(f'Unsupported mode: {func_mode}')
 
@@ -587,9 +649,9 @@ class MixedSignalModel:
             terms = []
             for k in range(funcs[j].order+1):
                 if k == 0:
-                    terms.append(self.get_signal(coeffs[j][k]))
+                    terms.append(self.signals[coeffs[j][k]])
                 else:
-                    terms.append(self.get_signal(coeffs[j][k])*prods_del[k-1])
+                    terms.append(self.signals[coeffs[j][k]]*prods_del[k-1])
             retval.append(self.set_this_cycle(signals[j], sum_op(terms)))
 
         # assign output value (single value or list, depending on Function/MultiFunction)
@@ -756,31 +818,33 @@ class MixedSignalModel:
         self.add_digital_state(name, width=width, init=init)
 
         if loop:
-            self.set_next_cycle(self.get_signal(name), (self.get_signal(name)+1)[(width-1):0],
+            self.set_next_cycle(self.signals[name], (self.signals[name]+1)[(width-1):0],
                                 clk=clk, rst=rst, ce=ce)
         else:
-            self.set_next_cycle(self.get_signal(name), min_op([self.get_signal(name)+1, (1<<width)-1]),
+            self.set_next_cycle(self.signals[name], min_op([self.signals[name]+1, (1<<width)-1]),
                                 clk=clk, rst=rst, ce=ce)
 
     def get_equation_io(self, eqn_sys: EqnSys):
         # determine all signals present in the set of equations
-        all_signal_names = set(signal_names(eqn_sys.get_all_signals()))
+        all_signal_names = frozenset(signal.name for signal in eqn_sys.get_all_signals())
 
         # determine inputs
         input_names = (signal_names(self.get_analog_inputs()) | self.assignments.keys()) & all_signal_names
-        inputs = self.get_signals(input_names)
+        inputs = [self.signals[name] for name in input_names]
 
-        # determine states
-        state_names = set(signal_names(eqn_sys.get_states()))
-        deriv_names = set(signal_names(eqn_sys.get_derivs()))
+        # determine states.  states and sel_bits come straight from the equations, so they are looked up with
+        # get_signals, which reports signals that have not been added to the model.
+        derivs = eqn_sys.get_derivs()
+        state_names = frozenset(deriv.signal.name for deriv in derivs)
+        deriv_names = frozenset(deriv.name for deriv in derivs)
         states = self.get_signals(state_names)
 
         # determine outputs
         output_names  = (all_signal_names - input_names - state_names - deriv_names) & self.signals.keys()
-        outputs = self.get_signals(output_names)
+        outputs = [self.signals[name] for name in output_names]
 
         # determine sel_bits
-        sel_bit_names = set(signal_names(eqn_sys.get_sel_bits()))
+        sel_bit_names = {sel_bit.name for sel_bit in eqn_sys.get_sel_bits()}
         sel_bits = self.get_signals(sel_bit_names)
 
         # return result
@@ -822,50 +886,61 @@ class MixedSignalModel:
         # initialize lists of matrices
         collection = LdsCollection()
 
+        # the substitution cache is shared across all bit combinations, so parts of the equations
+        # that do not depend on the sel_bits are only processed once
+        subst_cache = {}
+
         # iterate over all of the bit combinations
-        for k in range(2 ** len(sel_bits)):
+        for sel_bit_settings in settings_table(sel_bits):
             # substitute values for this particular setting
-            sel_bit_settings = address_to_settings(k, sel_bits)
-            eqn_sys_k = eqn_sys.subst_case(sel_bit_settings)
+            eqn_sys_k = eqn_sys.subst_case(sel_bit_settings, cache=subst_cache)
 
             # convert system of equations to a linear dynamical system
             lds = eqn_sys_k.to_lds(inputs=inputs, states=states, outputs=outputs)
 
-            # discretize linear dynamical system
-            lds = lds.discretize(dt=self.dt)
-
             # add to collection of LDS systems
             collection.append(lds)
 
-        # construct address for selection
-        if len(sel_bits) > 0:
-            sel = concatenate(sel_bits)
-        else:
-            sel = None
+        # discretize all of the linear dynamical systems at once
+        collection = collection.discretize(dt=self.dt)
+
+        # construct address for selection.  if there are several sel_bits, add_discrete_time_lds binds the
+        # concatenation to a signal so that it is only generated once, rather than once for every coefficient array.
+        sel = concatenate(sel_bits) if len(sel_bits) > 0 else None
 
         # add the discrete-time equation
         self.add_discrete_time_lds(collection=collection, inputs=inputs,
                                    states=states, outputs=outputs, sel=sel,
-                                   clk=clk, rst=rst)
+                                   clk=clk, rst=rst, bind_sel=(len(sel_bits) > 1))
 
     def add_discrete_time_lds(self, collection, inputs=None, states=None, outputs=None, sel=None,
-                              clk=None, rst=None):
+                              clk=None, rst=None, bind_sel=False):
         # set defaults
         inputs = inputs if inputs is not None else []
         states = states if states is not None else []
         outputs = outputs if outputs is not None else []
 
+        # if requested, the address is bound to a signal the first time a coefficient array uses it.  if every
+        # coefficient turns out to be the same for all sel settings, no signal is added.
+        def get_sel():
+            nonlocal sel, bind_sel
+            if bind_sel:
+                sel = self.bind_name(self.get_next_name('lds_sel_'), sel)
+                bind_sel = False
+            return sel
+
         # state updates.  state initialization is captured in the signal itself, so it doesn't have to be explicitly
         # captured here
+        A_terms = lds_terms(collection.A, states, len(states), get_sel)
+        B_terms = lds_terms(collection.B, inputs, len(states), get_sel)
         for row in range(len(states)):
-            expr = sum_op([array(collection.A[row, col], sel) * states[col] for col in range(len(states))])
-            expr += sum_op([array(collection.B[row, col], sel) * inputs[col] for col in range(len(inputs))])
-            self.set_next_cycle(states[row], expr, clk=clk, rst=rst)
+            self.set_next_cycle(states[row], sum_op(A_terms[row] + B_terms[row]), clk=clk, rst=rst)
 
         # output updates
+        C_terms = lds_terms(collection.C, states, len(outputs), get_sel)
+        D_terms = lds_terms(collection.D, inputs, len(outputs), get_sel)
         for row in range(len(outputs)):
-            expr = sum_op([array(collection.C[row, col], sel) * states[col] for col in range(len(states))])
-            expr += sum_op([array(collection.D[row, col], sel) * inputs[col] for col in range(len(inputs))])
+            expr = sum_op(C_terms[row] + D_terms[row])
 
             # if the output signal already exists, then assign it directly.  otherwise, bind the signal name to the
             # expression value
@@ -887,7 +962,7 @@ class MixedSignalModel:
         """
 
         # discretize transfer function
-        res = cont2discrete(tf, self.dt)
+        res = discretize_tf(tf, self.dt)
 
         # get numerator and denominator coefficients
         b = [+float(val) for val in res[0].flatten()]
@@ -897,8 +972,11 @@ class MixedSignalModel:
         i_hist = self.make_history(input_, len(b), clk=clk, rst=rst)
         o_hist = self.make_history(output, len(a), clk=clk, rst=rst)
 
-        # implement the filter
-        expr = sum_op([coeff * var for coeff, var in chain(zip(b, i_hist), zip(a[1:], o_hist))])
+        # implement the filter.  terms with zero coefficients (common in the numerator returned by cont2discrete)
+        # are skipped, rather than being built only to be discarded by sum_op.
+        coeffs = b + a[1:]
+        hist = i_hist + o_hist[:len(a)-1]
+        expr = sum_op([coeff * var for coeff, var in zip(coeffs, hist) if coeff != 0])
 
         # make the assignment
         self.set_next_cycle(signal=output, expr=expr, clk=clk, rst=rst)
@@ -970,36 +1048,35 @@ class MixedSignalModel:
 
     def make_history(self, first: ModelExpr, length: Integral, clk=None, rst=None, ce=None):
         # initialize
-        hist = []
+        hist = [first] if length > 0 else []
 
         # determine basename
         basename = first.name if hasattr(first, 'name') else next(self.namer)
 
-        # add elements to the history one by one
-        for k in range(length):
-            if k == 0:
-                hist.append(first)
+        # determine how to create the signals that store the history.  they all have the same format as the first
+        # element, so this is only worked out once.
+        if length > 1:
+            init = first.init if hasattr(first, 'init') else 0
+            if isinstance(first.format_, RealFormat):
+                state_cls = AnalogState
+                kwargs = dict(range_=first.format_.range_, width=first.format_.width,
+                              exponent=first.format_.exponent, init=init)
+            elif isinstance(first.format_, IntFormat):
+                state_cls = DigitalState
+                kwargs = dict(width=first.format_.width, signed=is_signed(first.format_), init=init)
             else:
-                # create the signal
-                name = f'{basename}_{k}'
-                if isinstance(first.format_, RealFormat):
-                    init = first.init if hasattr(first, 'init') else 0
-                    curr = AnalogState(name=name, range_=first.format_.range_, width=first.format_.width,
-                                       exponent=first.format_.exponent, init=init)
-                elif isinstance(first.format_, IntFormat):
-                    init = first.init if hasattr(first, 'init') else 0
-                    curr = DigitalState(name=name, width=first.format_.width, signed=is_signed(first.format_),
-                                        init=init)
-                else:
-                    raise Exception('Cannot determine format to use for storing history.')
+                raise Exception('Cannot determine format to use for storing history.')
 
-                self.add_signal(curr)
+        # add the remaining elements to the history one by one
+        for k in range(1, length):
+            # create the signal
+            curr = self.add_signal(state_cls(name=f'{basename}_{k}', **kwargs))
 
-                # make the update assignment
-                self.set_next_cycle(signal=curr, expr=hist[k - 1], clk=clk, rst=rst, ce=ce)
+            # make the update assignment
+            self.set_next_cycle(signal=curr, expr=hist[k - 1], clk=clk, rst=rst, ce=ce)
 
-                # add this signal to the history
-                hist.append(curr)
+            # add this signal to the history
+            hist.append(curr)
 
         # return result
         return hist
@@ -1024,12 +1101,14 @@ class MixedSignalModel:
         ios = []
         internals = []
         for signal in self.signals.values():
-            if isinstance(signal, (AnalogInput, AnalogOutput, DigitalInput, DigitalOutput)):
+            if isinstance(signal, IO_TYPES):
                 ios.append(signal)
                 continue
-            elif not self.has_assignment(signal.name):
+
+            assignment = self.assignments.get(signal.name)
+            if assignment is None:
                 raise Exception('The signal ' + signal.name + ' has not been assigned.')
-            elif not isinstance(self.get_assignment(signal.name), BindingAssignment):
+            elif not isinstance(assignment, BindingAssignment):
                 internals.append(signal)
 
         # start module
@@ -1091,12 +1170,24 @@ class MixedSignalModel:
         # make sure filename is a path
         filename = Path(filename).resolve()
 
-        # compile the code
-        self.compile(gen=gen)
-
-        # write file
+        # compile the code, streaming it to a temporary file that only replaces the target once compilation has
+        # succeeded.  this way a failed compile doesn't leave a truncated model in place of the previous one.
         filename.parent.mkdir(exist_ok=True, parents=True)
-        gen.write_to_file(filename=filename)
+        tmp_filename = filename.with_name(filename.name + '.tmp')
+        # the temporary file is removed if anything fails, including the final flush when the file is closed.  note
+        # that since the output is streamed, gen.text is empty afterwards.
+        gen.open(tmp_filename)
+        replaced = False
+        try:
+            try:
+                self.compile(gen=gen)
+            finally:
+                gen.close()
+            tmp_filename.replace(filename)
+            replaced = True
+        finally:
+            if not replaced and tmp_filename.exists():
+                tmp_filename.unlink()
 
         # write tables to file
         for table in self.lookup_tables:
@@ -1122,8 +1213,7 @@ class MixedSignalModel:
 
         # limit selection to just IOs if desired
         if io_only:
-            io_types = (AnalogInput, AnalogOutput, DigitalInput, DigitalOutput)
-            probe_list = [signal for signal in probe_list if isinstance(signal, io_types)]
+            probe_list = [signal for signal in probe_list if isinstance(signal, IO_TYPES)]
 
         # apply further filtering if desired
         if filter_func is not None:
@@ -0,0 +1,113 @@
+from msdsl import AnalogSignal, DigitalSignal, eqn_case
+from msdsl.eqn import cases
+from msdsl.eqn.cases import subst_case, address_to_settings, settings_table, bit_table
+from msdsl.expr.format import RealFormat
+
+
+def test_subst_case():
+    a = DigitalSignal('a')
+    x = AnalogSignal('x')
+    y = AnalogSignal('y')
+
+    expr = (x + 2*y) == eqn_case([3, 4], [a])*x
+
+    for val, coeff in [(0, 3), (1, 4)]:
+        subst = subst_case(expr, {'a': val})
+        assert str(subst) == str((x + 2*y) == coeff*x)
+
+
+def test_subst_case_unchanged():
+    a = DigitalSignal('a')
+    x = AnalogSignal('x')
+    y = AnalogSignal('y')
+
+    # expressions without any EqnCase should be returned as-is
+    expr = (x + 2*y) == 3*x
+    assert subst_case(expr, {'a': 0}) is expr
+
+    # subexpressions that do not depend on the sel_bits should be shared
+    lhs = x + 2*y
+    expr = lhs == eqn_case([3, 4], [a])*x
+    cache = {}
+    subst_0 = subst_case(expr, {'a': 0}, cache=cache)
+    subst_1 = subst_case(expr, {'a': 1}, cache=cache)
+    assert subst_0.lhs is lhs
+    assert subst_1.lhs is lhs
+    assert subst_0.rhs is not subst_1.rhs
+
+
+def test_intern():
+    a = DigitalSignal('a')
+    b = DigitalSignal('b')
+    x = AnalogSignal('x')
+    y = AnalogSignal('y')
+
+    # substitution results for settings that select the same cases collapse onto the same node
+    expr = (eqn_case([x, y], [a]) + 2*y) == eqn_case([x, x, y, y], [a, b])
+    cache = {}
+    subst_1 = subst_case(expr, {'a': 1, 'b': 0}, cache=cache)
+    subst_2 = subst_case(expr, {'a': 1, 'b': 1}, cache=cache)
+    assert subst_1 is subst_2
+    assert subst_case(expr, {'a': 0, 'b': 0}, cache=cache) is not subst_1
+
+    # without a shared cache, results are built separately
+    assert subst_case(expr, {'a': 1, 'b': 0}) is not subst_case(expr, {'a': 1, 'b': 0})
+
+
+def test_no_global_intern():
+    x = AnalogSignal('x', range_=1)
+    y = AnalogSignal('y', range_=2)
+
+    # expressions built separately are distinct objects, so changing the format of one doesn't affect the other
+    e1 = x + y
+    e2 = x + y
+    assert e1 is not e2
+    e2.format_ = RealFormat(range_=100)
+    assert e1.format_.range_ == 3
+
+
+def test_settings_table():
+    for n in range(6):
+        sel_bits = [DigitalSignal(f's{k}') for k in range(n)]
+        assert settings_table(sel_bits) == [address_to_settings(k, sel_bits) for k in range(1 << n)]
+
+
+def test_settings_table_wide(monkeypatch):
+    # selectors wider than MAX_BIT_TABLE_WIDTH are decoded one address at a time, without building a bit table
+    monkeypatch.setattr(cases, 'MAX_BIT_TABLE_WIDTH', 2)
+    bit_table.cache_clear()
+    sel_bits = [DigitalSignal(f's{k}') for k in range(4)]
+    assert settings_table(sel_bits) == [address_to_settings(k, sel_bits) for k in range(16)]
+    assert bit_table.cache_info().currsize == 0
+
+
+def test_get_address():
+    sel_bits = [DigitalSignal(f's{k}') for k in range(4)]
+    case = eqn_case(list(range(16)), sel_bits)
+    for addr in range(16):
+        assert case.get_address(address_to_settings(addr, sel_bits)) == addr
+
+    # extra sel_bits in the settings are treated as don't care bits
+    settings = address_to_settings(5, sel_bits)
+    settings['other'] = 1
+    assert case.get_address(settings) == 5
+
+
+def test_address_to_settings():
+    # compare against a direct bit-by-bit computation, for both narrow and wide selectors
+    for n in [3, 20]:
+        sel_bits = [DigitalSignal(f's{k}') for k in range(n)]
+        for addr in [0, 1, 5, (1 << n) - 1]:
+            expct = {sel_bit.name: (addr >> (n-1-k)) & 1 for k, sel_bit in enumerate(sel_bits)}
+            assert address_to_settings(addr, sel_bits) == expct
+
+
+def test_eqn_case_same():
+    a = DigitalSignal('a')
+    b = DigitalSignal('b')
+    x = AnalogSignal('x')
+
+    # case tables whose entries are all the same don't need an EqnCase
+    assert eqn_case([x, x], [a]) is x
+    assert str(eqn_case([2, 2, 2, 2], [a, b])) == '2'
+    assert str(eqn_case([2, 3], [a])).startswith('EqnCase')
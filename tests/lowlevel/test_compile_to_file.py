@@ -0,0 +1,37 @@
+import pytest
+from msdsl import MixedSignalModel, VerilogGenerator, AnalogInput, AnalogOutput, AnalogSignal
+
+
+def test_compile_to_file_error(tmp_path):
+    # a model that compiles successfully
+    m = MixedSignalModel('model', AnalogInput('a'), AnalogOutput('b'), build_dir=tmp_path)
+    m.set_this_cycle(m.b, m.a)
+    filename = m.compile_to_file(VerilogGenerator())
+    text = filename.read_text()
+    assert 'module model' in text
+
+    # a failed compile leaves the previous model in place, without any temporary files
+    m.add_signal(AnalogSignal('c'))
+    with pytest.raises(Exception, match='has not been assigned'):
+        m.compile_to_file(VerilogGenerator())
+    assert filename.read_text() == text
+    assert list(tmp_path.iterdir()) == [filename]
+
+
+class FailingCloseGenerator(VerilogGenerator):
+    def close(self):
+        super().close()
+        raise OSError('No space left on device')
+
+
+def test_compile_to_file_close_error(tmp_path):
+    m = MixedSignalModel('model', AnalogInput('a'), AnalogOutput('b'), build_dir=tmp_path)
+    m.set_this_cycle(m.b, m.a)
+    filename = m.compile_to_file(VerilogGenerator())
+    text = filename.read_text()
+
+    # a failure while closing the output file also leaves the previous model in place
+    with pytest.raises(OSError, match='No space left on device'):
+        m.compile_to_file(FailingCloseGenerator())
+    assert filename.read_text() == text
+    assert list(tmp_path.iterdir()) == [filename]
@@ -0,0 +1,165 @@
+import warnings
+import pytest
+import numpy as np
+from scipy.linalg import expm
+from msdsl.eqn.lds import LDS, LdsCollection, discretize_lds_list, discretize_stack
+
+
+def discretize_ref(lds, dt):
+    A_tilde = expm(dt*lds.A)
+    B_tilde = np.linalg.solve(lds.A, (A_tilde - np.eye(*lds.A.shape)).dot(lds.B))
+    return A_tilde, B_tilde
+
+
+def make_lds_list(n, m, count, seed=1):
+    rng = np.random.default_rng(seed)
+    return [LDS(A=rng.uniform(-2, 2, (n, n)) - 3*np.eye(n), B=rng.uniform(-1, 1, (n, m)),
+                C=rng.uniform(-1, 1, (1, n)), D=rng.uniform(-1, 1, (1, m)))
+            for _ in range(count)]
+
+
+def test_discretize_lds_list():
+    dt = 0.1
+    lds_list = make_lds_list(n=3, m=2, count=4)
+    for lds, lds_tilde in zip(lds_list, discretize_lds_list(lds_list, dt=dt)):
+        A_tilde, B_tilde = discretize_ref(lds, dt)
+        assert np.allclose(lds_tilde.A, A_tilde)
+        assert np.allclose(lds_tilde.B, B_tilde)
+        assert np.array_equal(lds_tilde.C, lds.C)
+        assert np.array_equal(lds_tilde.D, lds.D)
+
+
+def test_lds_collection():
+    lds_list = make_lds_list(n=2, m=1, count=3)
+    collection = LdsCollection()
+    for lds in lds_list:
+        collection.append(lds)
+
+    assert collection.A.shape == (2, 2, 3)
+    assert collection.B.shape == (2, 1, 3)
+    for k, lds in enumerate(lds_list):
+        assert np.array_equal(collection.A[:, :, k], lds.A)
+        assert np.array_equal(collection.D[:, :, k], lds.D)
+
+    collection = collection.discretize(dt=0.1)
+    for k, lds in enumerate(lds_list):
+        A_tilde, B_tilde = discretize_ref(lds, 0.1)
+        assert np.allclose(collection.A[:, :, k], A_tilde)
+        assert np.allclose(collection.B[:, :, k], B_tilde)
+
+
+def test_discretize_repeated():
+    # repeated systems (within a list and across calls) give the same results as distinct ones
+    lds_list = make_lds_list(n=2, m=1, count=2, seed=2)
+    first = discretize_lds_list([lds_list[0], lds_list[1], lds_list[0]], dt=0.1)
+    again = discretize_lds_list([lds_list[1], lds_list[0]], dt=0.1)
+    for lds, lds_tilde in [(lds_list[0], first[0]), (lds_list[1], first[1]), (lds_list[0], first[2]),
+                           (lds_list[1], again[0]), (lds_list[0], again[1])]:
+        A_tilde, B_tilde = discretize_ref(lds, 0.1)
+        assert np.allclose(lds_tilde.A, A_tilde)
+        assert np.allclose(lds_tilde.B, B_tilde)
+
+    # modifying a result must not affect later lookups
+    again[0].A[:] = 0
+    A_tilde, _ = discretize_ref(lds_list[1], 0.1)
+    assert np.allclose(discretize_lds_list([lds_list[1]], dt=0.1)[0].A, A_tilde)
+
+    # a different timestep is not confused with a cached one
+    A_tilde, B_tilde = discretize_ref(lds_list[0], 0.2)
+    assert np.allclose(lds_list[0].discretize(dt=0.2).A, A_tilde)
+
+
+@pytest.mark.parametrize('A', [
+    [[-3.0]],
+    [[0.0]],
+    [[-1.0, 2.0], [0.5, -3.0]],     # real eigenvalues
+    [[0.0, 1.0], [-4.0, -0.1]],     # complex eigenvalues
+    [[-2.0, 1.0], [0.0, -2.0]],     # repeated eigenvalue
+    [[-1e3, 1.0], [0.0, -1.0]],     # stiff
+    [[0.0, 1.0], [0.0, 0.0]]        # singular
+])
+def test_discretize_no_inputs(A):
+    # systems without inputs only need A_tilde
+    A = np.array(A)
+    for dt in [1e-3, 0.1, 1.0]:
+        A_tilde, B_tilde = discretize_stack(A[np.newaxis], None, dt)
+        assert np.allclose(A_tilde[0], expm(dt*A), rtol=1e-12, atol=1e-14)
+        assert B_tilde is None
+
+
+def test_discretize_small():
+    # mix of 2x2 systems, one of which has a singular A matrix.  none of them should produce warnings.
+    A = np.array([[[-1.0, 2.0], [0.5, -3.0]], [[0.0, 1.0], [-4.0, -0.1]], [[0.0, 1.0], [0.0, 0.0]]])
+    B = np.array([[[1.0], [0.0]], [[0.0], [1.0]], [[1.0], [1.0]]])
+
+    # without B, singular A is not a problem
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        A_tilde, B_tilde = discretize_stack(A, None, 0.1)
+    assert B_tilde is None
+    for k in range(len(A)):
+        assert np.allclose(A_tilde[k], expm(0.1*A[k]))
+
+    # with B, the nonsingular systems match the reference
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        A_tilde, B_tilde = discretize_stack(A, B, 0.1)
+    for k in range(2):
+        A_ref, B_ref = discretize_ref(LDS(A=A[k], B=B[k]), 0.1)
+        assert np.allclose(A_tilde[k], A_ref)
+        assert np.allclose(B_tilde[k], B_ref)
+
+    # the singular system is a double integrator, so B_tilde is the integral of expm(A*t)*B from 0 to dt
+    assert np.allclose(A_tilde[2], [[1, 0.1], [0, 1]])
+    assert np.allclose(B_tilde[2], [[0.1 + 0.1**2/2], [0.1]])
+
+
+@pytest.mark.parametrize('A', [
+    [[-1.0, 2.0], [0.5, -3.0]],
+    [[-1.0, 2.0, 0.0], [0.5, -3.0, 1.0], [0.0, 1.0, -2.0]]
+])
+@pytest.mark.parametrize('dt', [1e-4, 1e-8, 1e-10])
+def test_discretize_small_dt(A, dt):
+    # B_tilde keeps full precision when dt*|A| is small, for any size of system.  in that case the first few
+    # terms of the series dt*B + dt**2/2*A*B + dt**3/6*A**2*B + ... are accurate to well beyond double precision.
+    A = np.array(A)
+    B = np.linspace(0.5, 1.0, len(A))[:, np.newaxis]
+    _, B_tilde = discretize_stack(A[np.newaxis], B[np.newaxis], dt)
+    B_ref, term = np.zeros_like(B), dt*B
+    for k in range(2, 10):
+        B_ref, term = B_ref + term, dt/k*A.dot(term)
+    assert np.allclose(B_tilde[0], B_ref, rtol=1e-14, atol=0)
+
+
+def test_discretize_general():
+    # larger systems go through the general method
+    dt = 0.05
+    lds_list = make_lds_list(n=4, m=3, count=3, seed=3)
+    for lds, lds_tilde in zip(lds_list, discretize_lds_list(lds_list, dt=dt)):
+        A_tilde, B_tilde = discretize_ref(lds, dt)
+        assert np.allclose(lds_tilde.A, A_tilde)
+        assert np.allclose(lds_tilde.B, B_tilde)
+
+
+def test_discretize_diag():
+    # diagonal systems (including one with an integrator) mixed with a dense one
+    A = np.array([[[-1.0, 0.0, 0.0], [0.0, -2e3, 0.0], [0.0, 0.0, 0.5]],
+                  [[-1.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, -3.0]],
+                  [[-1.0, 1.0, 0.0], [0.0, -2.0, 0.0], [0.5, 0.0, -3.0]]])
+    B = np.array([[[1.0, 2.0], [0.0, 1.0], [1.0, 0.0]]]*3)
+
+    A_tilde, B_tilde = discretize_stack(A, B, 0.1)
+    for k in [0, 2]:
+        A_ref, B_ref = discretize_ref(LDS(A=A[k], B=B[k]), 0.1)
+        assert np.allclose(A_tilde[k], A_ref)
+        assert np.allclose(B_tilde[k], B_ref)
+
+    # the integrator row of B_tilde is just dt times the row of B
+    assert np.allclose(A_tilde[1], np.diag(np.exp([-0.1, 0.0, -0.3])))
+    assert np.allclose(B_tilde[1][1], 0.1*B[1][1])
+    assert np.allclose(B_tilde[1][[0, 2]], [[(1-np.exp(-0.1))*1, (1-np.exp(-0.1))*2], [(1-np.exp(-0.3))/3, 0]])
+
+    A_tilde, B_tilde = discretize_stack(A, None, 0.1)
+    assert B_tilde is None
+    for k in range(len(A)):
+        assert np.allclose(A_tilde[k], expm(0.1*A[k]))
@@ -0,0 +1,98 @@
+import pytest
+import numpy as np
+from scipy.signal import cont2discrete
+from msdsl import (MixedSignalModel, AnalogInput, AnalogOutput, AnalogSignal, DigitalInput, DigitalOutput,
+                   DigitalSignal, Deriv, eqn_case)
+from msdsl.model import discretize_tf
+
+
+def test_eqn_sys_undefined_signals():
+    m = MixedSignalModel('model', AnalogInput('a'), AnalogOutput('b'), dt=1e-9)
+
+    # derivative of a signal that was never added to the model
+    s = AnalogSignal('s')
+    with pytest.raises(AssertionError, match='The signal s has not been defined.'):
+        m.add_eqn_sys([Deriv(s) == m.a - s])
+
+    # sel_bit that was never added to the model
+    sel = DigitalSignal('sel')
+    with pytest.raises(AssertionError, match='The signal sel has not been defined.'):
+        m.add_eqn_sys([m.b == eqn_case([1, 2], [sel])*m.a])
+
+
+def test_eqn_sys_sel_binding():
+    # the sel_bit address is bound to a signal when a coefficient depends on it
+    m = MixedSignalModel('model', AnalogInput('a'), AnalogOutput('b'), DigitalInput('s0'), DigitalInput('s1'),
+                         dt=1e-9)
+    m.add_eqn_sys([m.b == eqn_case([1, 2, 3, 4], [m.s0, m.s1])*m.a])
+    assert m.has_signal('lds_sel_0')
+
+    # ... but not when every coefficient is the same for all sel settings
+    m = MixedSignalModel('model', AnalogInput('a'), AnalogOutput('b'), DigitalInput('s0'), DigitalInput('s1'),
+                         dt=1e-9)
+    c = AnalogSignal('c')
+    m.add_eqn_sys([m.b == m.a, c == eqn_case([1, 2, 3, 4], [m.s0, m.s1])*m.a])
+    assert not m.has_signal('lds_sel_0')
+
+
+def test_signal_access():
+    m = MixedSignalModel('model', AnalogInput('x'))
+
+    # signals can be accessed as attributes or by indexing
+    assert m.x is m.signals['x']
+    assert m['x'] is m.x
+    assert hasattr(m, 'x')
+
+    # unknown signals raise AttributeError, so hasattr and getattr with a default work
+    assert not hasattr(m, 'y')
+    assert getattr(m, 'y', None) is None
+    with pytest.raises(AttributeError, match='The signal y has not been defined.'):
+        m.y
+
+    # private names are never looked up in the signal table
+    m.add_signal(AnalogSignal('_z'))
+    assert m['_z'].name == '_z'
+    with pytest.raises(AttributeError):
+        m._z
+
+    # indexing with an unknown name reports the missing signal
+    with pytest.raises(AssertionError, match='The signal y has not been defined.'):
+        m['y']
+
+
+def test_discretize_tf():
+    tf = ([1.0, 2.0], [1.0, 3.0, 2.0])
+    dt = 0.1
+
+    # cached results match a direct call to cont2discrete, on both the first call and a cache hit
+    expct = cont2discrete(tf, dt)
+    for _ in range(2):
+        meas = discretize_tf(tf, dt)
+        assert np.array_equal(meas[0], expct[0])
+        assert np.array_equal(meas[1], expct[1])
+        assert meas[2] == expct[2]
+
+    # the cached arrays can't be modified by callers
+    with pytest.raises(ValueError):
+        meas[0][...] = 123
+    assert np.array_equal(discretize_tf(tf, dt)[0], expct[0])
+
+
+def test_io_signals():
+    m = MixedSignalModel('model', AnalogInput('a'), DigitalOutput('b'), AnalogOutput('c'), DigitalInput('d'))
+    m.add_analog_state('e', range_=1)
+    m.add_digital_input('f')
+    m.add_analog_input('g')
+    m.add_digital_output('h')
+    m.add_analog_output('i')
+    m.add_signal(AnalogSignal('j'))
+
+    # I/O signals tracked by type match filtering all signals by type, in the order they were added
+    for getter, io_type in [(m.get_analog_inputs, AnalogInput), (m.get_analog_outputs, AnalogOutput),
+                            (m.get_digital_inputs, DigitalInput), (m.get_digital_outputs, DigitalOutput)]:
+        expct = [signal.name for signal in m.signals.values() if isinstance(signal, io_type)]
+        assert [signal.name for signal in getter()] == expct
+
+        # the returned list is a copy
+        getter().clear()
+        assert [signal.name for signal in getter()] == expct